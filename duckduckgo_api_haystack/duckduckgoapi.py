@@ -3,10 +3,22 @@
 # SPDX-FileCopyrightText: 2022-present deepset GmbH <info@deepset.ai>
 #
 # SPDX-License-Identifier: Apache-2.0
+import asyncio
+import hashlib
+import json
+import sqlite3
+import unicodedata
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from threading import Lock
 from time import time, sleep
-from typing import Any, Dict, List, Optional, Union
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import DuckDuckGoSearchException, RatelimitException, TimeoutException
 
 from haystack import ComponentError, Document, component, default_from_dict, default_to_dict, logging
 
@@ -15,6 +27,47 @@ logger = logging.getLogger(__name__)
 class DuckduckgoApiWebSearchError(ComponentError): ...
 
 
+class _LeaderCancelled(Exception):
+    """
+    Set on an in-flight search whose leader was interrupted before completing it: the waiting callers search again.
+    """
+
+
+# After any error, a DDGS client refuses every further request with this message (duckduckgo_search 6.x)
+_FAILED_CLIENT_ERROR = "Exception occurred in previous call."
+
+
+class _VqdCachingDDGS(DDGS):
+    """
+    DDGS client reusing the vqd token of each query instead of fetching it again before every text search.
+
+    The token costs a request to duckduckgo.com; tokens are kept for VQD_TTL seconds, for the last VQD_CACHE_SIZE
+    queries.
+    """
+
+    VQD_TTL = 1800
+    VQD_CACHE_SIZE = 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._vqd_cache = OrderedDict()
+        self._vqd_lock = Lock()
+
+    def _get_vqd(self, keywords: str) -> str:
+        with self._vqd_lock:
+            entry = self._vqd_cache.get(keywords)
+            if entry is not None and time() - entry[0] < self.VQD_TTL:
+                self._vqd_cache.move_to_end(keywords)
+                return entry[1]
+        vqd = super()._get_vqd(keywords)
+        with self._vqd_lock:
+            self._vqd_cache[keywords] = (time(), vqd)
+            self._vqd_cache.move_to_end(keywords)
+            while len(self._vqd_cache) > self.VQD_CACHE_SIZE:
+                self._vqd_cache.popitem(last=False)
+        return vqd
+
+
 @component
 class DuckduckgoApiWebSearch:
     """
@@ -46,7 +99,13 @@ class DuckduckgoApiWebSearch:
         timeout: int = 10,
         use_answers: bool = False,
         proxy: str | None = None,
-        max_search_frequency: float = float('inf')
+        max_search_frequency: float = float('inf'),
+        searches_per_second: Optional[float] = None,
+        search_burst: int = 1,
+        max_retries: int = 2,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = None,
+        cache_path: Optional[str] = None
     ):
         """
         Initialize the DuckduckgoWebSearch component.
@@ -60,7 +119,8 @@ class DuckduckgoApiWebSearch:
         website.
 
         :param top_k: Maximum number of documents to return.
-        :param max_results: Maximum number of documents to consider in the search.
+        :param max_results: Maximum number of documents to consider in the search. Capped to top_k, since at most
+            top_k links are returned.
         :param region: defaults to no region
         :param safesearch: Defaults to "moderate", other options: "on" and "off".
         :param timelimit: d, w, m. Defaults to None.
@@ -69,44 +129,274 @@ class DuckduckgoApiWebSearch:
         :param timeout: Timeout for each search request
         :param use_answers: (bool) Includes the answer search by duckduckgo. Defaults to False.
         :param proxy: web address to proxy
-        :param max_search_frequency: Minimum time to pass between each search in seconds (defaults to no limit)
+        :param max_search_frequency: Deprecated, use searches_per_second. Minimum time to pass between each search
+            in seconds (defaults to no limit)
+        :param searches_per_second: Maximum number of searches per second on average (defaults to no limit)
+        :param search_burst: Number of searches that can be run back to back before searches_per_second applies
+        :param max_retries: Number of times a search that is rate limited or times out is retried, with exponential
+            backoff
+        :param cache_size: Number of queries whose results are kept in memory and reused (defaults to 0, no cache)
+        :param cache_ttl: Time in seconds after which a cached result is searched again (defaults to no expiry)
+        :param cache_path: Path of a SQLite database where the results are also cached, so that they are kept
+            between runs (defaults to None, no database). Expired results are never deleted from the database.
+            Call close() (or use the component as a context manager) to close it.
         """
 
         self.top_k = top_k
-        self.max_results = max_results
-        self.region = region
-        self.safesearch = safesearch
-        self.timelimit = timelimit
-        self.backend = backend
         self.allowed_domain = allowed_domain
         self.timeout = timeout
 
         self.use_answers = use_answers
 
-        self.search_params = {'max_results': self.max_results,
-                              'region': self.region,
-                              'safesearch': self.safesearch,
-                              'timelimit': self.timelimit,
-                              'backend': self.backend}
+        # Only the first top_k links are returned (answers are not links): no need to fetch more results
+        search_max_results = max_results
+        if self.top_k is not None and search_max_results is not None and search_max_results > self.top_k:
+            search_max_results = self.top_k
+
+        # The other search parameters are only kept here
+        self.search_params = MappingProxyType({'max_results': search_max_results,
+                                               'region': region,
+                                               'safesearch': safesearch,
+                                               'timelimit': timelimit,
+                                               'backend': backend})
+        # The parts of the query and of the cache key that do not change between searches
+        self._query_prefix = f"site:{self.allowed_domain} " if self.allowed_domain else ""
+        self._cache_key_params = (self.allowed_domain, tuple(sorted(self.search_params.items())), self.use_answers)
 
         self.proxy = proxy
-        self.ddgs = DDGS(proxy=self.proxy)
+        # A single DDGS instance keeps one HTTP client (and its open connections) for all the searches
+        self.ddgs = self._new_client()
+        self._client_lock = Lock()
+        self.max_retries = max_retries
+
+        if max_search_frequency != float('inf'):
+            warnings.warn("'max_search_frequency' is deprecated, use 'searches_per_second' instead.",
+                          DeprecationWarning, stacklevel=2)
+            if searches_per_second is None and max_search_frequency > 0:
+                searches_per_second = 1 / max_search_frequency
+                search_burst = 1
+        if searches_per_second is not None and searches_per_second <= 0:
+            raise ValueError(f"searches_per_second must be positive, got {searches_per_second}")
+        if search_burst < 1:
+            raise ValueError(f"search_burst must be at least 1, got {search_burst}")
+
+        # Token bucket: each search takes a token, tokens are refilled at searches_per_second up to search_burst
+        self.searches_per_second = searches_per_second
+        self.search_burst = search_burst
+        self._rate_limited = searches_per_second is not None
+        self._tokens = float(search_burst)
+        self._last_refill = time()
+        self._rate_limit_lock = Lock()
+
+        if cache_size < 0:
+            raise ValueError(f"cache_size must not be negative, got {cache_size}")
+        if cache_ttl is not None and cache_ttl < 0:
+            raise ValueError(f"cache_ttl must not be negative, got {cache_ttl}")
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._cache_lock = Lock()
+        self.cache_path = cache_path
+        self._cache_db = self._open_cache_db(cache_path) if cache_path else None
+        self._cache_db_lock = Lock()
+        self._inflight = {}
+        self._inflight_lock = Lock()
+
+        self._serialized = default_to_dict(
+            self,
+            top_k=self.top_k,
+            max_results=max_results,
+            region=region,
+            safesearch=safesearch,
+            timelimit=timelimit,
+            backend=backend,
+            allowed_domain=self.allowed_domain,
+            timeout=self.timeout,
+            use_answers=self.use_answers,
+            proxy=self.proxy,
+            searches_per_second=self.searches_per_second,
+            search_burst=self.search_burst,
+            max_retries=self.max_retries,
+            cache_size=self.cache_size,
+            cache_ttl=self.cache_ttl,
+            cache_path=self.cache_path
+        )
 
-        self.max_search_frequency = max_search_frequency
-        self.last_search_time = 0
+    def close(self):
+        """
+        Closes the cache database, if any. Searches after closing only use the in-memory cache.
+        """
+        with self._cache_db_lock:
+            if self._cache_db is not None:
+                self._cache_db.close()
+                self._cache_db = None
 
-    def _rate_limit(self):
+    def __enter__(self) -> "DuckduckgoApiWebSearch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _new_client(self) -> DDGS:
+        """
+        Creates the duckduckgo_search client used for the searches.
+        """
+        return _VqdCachingDDGS(proxy=self.proxy, timeout=self.timeout)
+
+    def _replace_client(self, failed_client: DDGS):
         """
-        Implements rate limiting based on the max_searches_per_second parameter.
+        Replaces the client that raised an error, unless another search has already replaced it.
         """
-        if self.max_search_frequency != float('inf'):
+        with self._client_lock:
+            if self.ddgs is failed_client:
+                self.ddgs = self._new_client()
+
+    def _rate_limit_wait_seconds(self) -> float:
+        """
+        Takes a token from the bucket, returning how many seconds to wait before searching.
+
+        Implements rate limiting with a token bucket based on the searches_per_second and search_burst parameters.
+        """
+        with self._rate_limit_lock:
             current_time = time()
-            time_since_last_search = current_time - self.last_search_time
-            time_to_wait = max(0.0, self.max_search_frequency - time_since_last_search)
-            if time_to_wait > 0:
-                sleep(time_to_wait)
-            self.last_search_time = time()
+            self._tokens = min(float(self.search_burst),
+                               self._tokens + (current_time - self._last_refill) * self.searches_per_second)
+            self._last_refill = current_time
+            # The token is taken right away: concurrent searches queue up behind the negative balance
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.searches_per_second)
 
+    def _rate_limit(self):
+        """
+        Waits, blocking the thread, until the rate limit allows the next search.
+        """
+        if not self._rate_limited:
+            return
+        time_to_wait = self._rate_limit_wait_seconds()
+        if time_to_wait > 0:
+            sleep(time_to_wait)
+
+    async def _arate_limit(self):
+        """
+        Waits, without blocking the event loop, until the rate limit allows the next search.
+        """
+        if not self._rate_limited:
+            return
+        time_to_wait = self._rate_limit_wait_seconds()
+        if time_to_wait > 0:
+            await asyncio.sleep(time_to_wait)
+
+    def _cache_key(self, query: str) -> tuple:
+        """
+        Builds the key identifying the results of a query in the cache.
+        """
+        return (self._normalize_query(query), *self._cache_key_params)
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """
+        Normalizes the query so that trivially different queries (case, spacing, final punctuation) share the cache.
+
+        The normalized query is only used for the cache key: duckduckgo receives the query as given.
+        """
+        query = unicodedata.normalize("NFKC", query).casefold()
+        return " ".join(query.rstrip().rstrip("?!.,;:").split())
+
+    def _cache_get(self, key: tuple) -> Optional[Dict[str, Union[List[Document], List[str]]]]:
+        """
+        Returns the cached results for the key, or None if they are missing or expired.
+
+        The in-memory cache is looked up first, then the database.
+        """
+        if self.cache_size:
+            with self._cache_lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    timestamp, results = entry
+                    if self._is_fresh(timestamp):
+                        self._cache.move_to_end(key)
+                        return results
+                    del self._cache[key]
+        if self._cache_db is not None:
+            entry = self._cache_db_get(key)
+            if entry is not None:
+                timestamp, results = entry
+                self._memory_cache_put(key, timestamp, results)
+                return results
+        return None
+
+    def _cache_put(self, key: tuple, results: Dict[str, Union[List[Document], List[str]]]):
+        """
+        Stores the results in the in-memory cache and in the database, when they are enabled.
+        """
+        timestamp = time()
+        self._memory_cache_put(key, timestamp, results)
+        if self._cache_db is not None:
+            self._cache_db_put(key, timestamp, results)
+
+    def _is_fresh(self, timestamp: float) -> bool:
+        """
+        Checks whether results cached at timestamp can still be used.
+        """
+        return self.cache_ttl is None or time() - timestamp <= self.cache_ttl
+
+    def _memory_cache_put(self, key: tuple, timestamp: float, results: Dict[str, Union[List[Document], List[str]]]):
+        """
+        Stores the results in memory, evicting the least recently used entries if the cache is full.
+        """
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._cache[key] = (timestamp, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _open_cache_db(cache_path: str) -> sqlite3.Connection:
+        """
+        Opens the SQLite database storing the cached results, creating it if needed.
+        """
+        connection = sqlite3.connect(cache_path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS search_cache "
+                           "(key TEXT PRIMARY KEY, timestamp REAL, results TEXT)")
+        return connection
+
+    def _cache_db_key(self, key: tuple) -> str:
+        """
+        Hashes the cache key, together with top_k, into the key of the database.
+        """
+        # The stored results are already cut to top_k: components with a different top_k cannot share them
+        return hashlib.blake2b(json.dumps([*key, self.top_k]).encode(), digest_size=16).hexdigest()
+
+    def _cache_db_get(self, key: tuple) -> Optional[Tuple[float, Dict[str, Union[List[Document], List[str]]]]]:
+        """
+        Returns the timestamp and the results stored in the database for the key, or None if missing or expired.
+        """
+        with self._cache_db_lock:
+            if self._cache_db is None:  # Closed in the meantime
+                return None
+            row = self._cache_db.execute("SELECT timestamp, results FROM search_cache WHERE key = ?",
+                                         (self._cache_db_key(key),)).fetchone()
+        if row is None or not self._is_fresh(row[0]):
+            return None
+        stored = json.loads(row[1])
+        return row[0], {"documents": [Document.from_dict(document) for document in stored["documents"]],
+                        "links": stored["links"]}
+
+    def _cache_db_put(self, key: tuple, timestamp: float, results: Dict[str, Union[List[Document], List[str]]]):
+        """
+        Stores the results in the database.
+        """
+        stored = json.dumps({"documents": [document.to_dict() for document in results["documents"]],
+                             "links": results["links"]})
+        with self._cache_db_lock:
+            if self._cache_db is None:  # Closed in the meantime
+                return
+            self._cache_db.execute("INSERT OR REPLACE INTO search_cache (key, timestamp, results) VALUES (?, ?, ?)",
+                                   (self._cache_db_key(key), timestamp, stored))
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -115,19 +405,8 @@ class DuckduckgoApiWebSearch:
         :returns:
               Dictionary with serialized data.
         """
-        return default_to_dict(
-            self,
-            top_k=self.top_k,
-            max_results=self.max_results,
-            region=self.region,
-            safesearch=self.safesearch,
-            timelimit=self.timelimit,
-            backend=self.backend,
-            allowed_domain=self.allowed_domain,
-            timeout=self.timeout,
-            use_answers=self.use_answers,
-            proxy=self.proxy
-        )
+        # The init parameters do not change after __init__: copy the dictionary so callers can modify it
+        return {**self._serialized, "init_parameters": dict(self._serialized["init_parameters"])}
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "DuckduckgoApiWebSearch":
@@ -150,53 +429,253 @@ class DuckduckgoApiWebSearch:
         :returns: A dictionary with the following keys:
             - "documents": List of documents returned by the search engine.
             - "links": List of links returned by the search engine.
-        :raises TimeoutError: If the request to the SearchApi API times out.
-        :raises DuckDuckGoSearchException: If duckduckgo_search returns an error.
-        :raises RatelimitException: Raised for exceeding API request rate limits.
-        :raises TimeoutException: Raised for API request timeouts.
+        :raises DuckduckgoApiWebSearchError: If the query is empty, if duckduckgo_search returns an error, or if the
+            search is still rate limited or timing out after max_retries retries.
         """
-        self._rate_limit() # If configured to do so, wait for the next search
+        self._check_query(query)
+        key = self._cache_key(query)
+        results = self._cache_get(key)
+        if results is None:
+            results = self._search_once(key, query)
+        return {"documents": results["documents"][:self.top_k], "links": results["links"][:self.top_k]}
+
+    def run_many(self, queries: List[str],
+                 concurrency: int = 8) -> List[Dict[str, Union[List[Document], List[str]]]]:
+        """
+        Searches several queries, running up to `concurrency` searches at the same time in a pool of threads.
+
+        Rate limiting and caching apply to each query as in `run`.
+
+        :param queries: Search queries.
+        :param concurrency: Maximum number of searches running at the same time.
+        :returns: The results of `run` for each query, in the same order as the queries.
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(self.run, queries))
+
+    @component.output_types(documents=List[Document], links=List[str])
+    async def run_async(self, query: str) -> Dict[str, Union[List[Document], List[str]]]:
+        """
+        Asynchronously uses [Duckduckgo](https://duckduckgo.com/) to search the web.
+
+        The cache lookup and the search run in worker threads and the rate limit is awaited, so the event loop is
+        never blocked. As in `run`, only the call actually searching a query takes a rate limit token: concurrent
+        calls for the same query wait for its results.
+
+        :param query: Search query.
+        :returns: A dictionary with the following keys:
+            - "documents": List of documents returned by the search engine.
+            - "links": List of links returned by the search engine.
+        """
+        self._check_query(query)
+        key = self._cache_key(query)
+        results = await asyncio.to_thread(self._cache_get, key)
+        while results is None:
+            future, is_leader = self._join_inflight(key)
+            if not is_leader:
+                try:
+                    # Shielded: a cancelled caller must not cancel the search shared with the others
+                    results = await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    pass  # The leader was interrupted: search again
+                continue
 
-        documents = []
-        if self.use_answers:
             try:
-                answers = self.ddgs.answers(query)
-            except Exception as e:
-                raise DuckduckgoApiWebSearchError(f"An error occurred while querying {self.__class__.__name__}."
-                                               f"Error: {e}") from e
-            for answer in answers:
-                documents.append(
-                    Document.from_dict({"title": '', "content": answer["text"], "link": answer["url"]})
-                )
+                # Take a rate limit token only if the results were not cached in the meantime
+                if self._rate_limited and (await asyncio.to_thread(self._cache_get, key)) is None:
+                    await self._arate_limit()
+            except BaseException:
+                self._abandon_inflight(key, future)
+                raise
+            # Shielded: once started, the search completes the shared future even if this caller is cancelled
+            results = await asyncio.shield(asyncio.to_thread(self._lead_search, key, future, query, False))
+        return {"documents": results["documents"][:self.top_k], "links": results["links"][:self.top_k]}
+
+    async def run_batch(self, queries: List[str],
+                        concurrency: int = 8) -> List[Dict[str, Union[List[Document], List[str]]]]:
+        """
+        Asynchronously searches several queries, running up to `concurrency` searches at the same time.
 
-        query = f"site:{self.allowed_domain} {query}" if self.allowed_domain else query
-        payload = {"keywords": query, **self.search_params}
+        Rate limiting and caching apply to each query as in `run`.
 
+        :param queries: Search queries.
+        :param concurrency: Maximum number of searches running at the same time.
+        :returns: The results of `run` for each query, in the same order as the queries.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(query: str) -> Dict[str, Union[List[Document], List[str]]]:
+            async with semaphore:
+                return await self.run_async(query)
+
+        return list(await asyncio.gather(*(run_one(query) for query in queries)))
+
+    def _check_query(self, query: str):
+        """
+        Rejects empty queries, which duckduckgo_search does not accept.
+        """
+        if not query or not query.strip():
+            raise DuckduckgoApiWebSearchError(f"{self.__class__.__name__} cannot search an empty query.")
+
+    def _search_once(self, key: tuple, query: str) -> Dict[str, Union[List[Document], List[str]]]:
+        """
+        Searches the query, sharing the results with the concurrent calls searching the same key.
+
+        The first caller runs the search and caches its results, the others wait for it instead of sending
+        the same request again.
+        """
+        while True:
+            future, is_leader = self._join_inflight(key)
+            if is_leader:
+                return self._lead_search(key, future, query)
+            try:
+                return future.result()
+            except _LeaderCancelled:
+                pass  # The leader was interrupted: search again
+
+    def _join_inflight(self, key: tuple) -> Tuple[Future, bool]:
+        """
+        Returns the future of the search in flight for the key and whether the caller has to run it.
+
+        If no search is in flight, a new future is registered and the caller becomes the one running the search: it
+        must complete it with _lead_search, or give it up with _abandon_inflight.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by the callers waiting for it
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            return future, True
+
+    def _lead_search(self, key: tuple, future: Future, query: str,
+                     rate_limit: bool = True) -> Dict[str, Union[List[Document], List[str]]]:
+        """
+        Runs the search in flight for the key and completes its future with the results or the error.
+
+        If the search is interrupted (KeyboardInterrupt, cancellation...) the waiting callers search again instead of
+        receiving the interruption.
+        """
         try:
-            results = self.ddgs.text(**payload)
+            # A search that completed after the caller checked the cache may have cached the results already
+            results = self._cache_get(key)
+            if results is None:
+                results = self._search_and_cache(key, query, rate_limit)
         except Exception as e:
-            raise DuckduckgoApiWebSearchError(f"An error occurred while querying {self.__class__.__name__}."
-                                           f"Error: {e}") from e
+            self._leave_inflight(key)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._abandon_inflight(key, future)
+            raise
+        self._leave_inflight(key)
+        future.set_result(results)
+        return results
+
+    def _abandon_inflight(self, key: tuple, future: Future):
+        """
+        Gives up the search in flight for the key before completing it: the waiting callers search again.
+        """
+        self._leave_inflight(key)
+        future.set_exception(_LeaderCancelled())
 
-        # results is a list of dictionaries each with title, body, href,
-        # converting them to Documents:
+    def _leave_inflight(self, key: tuple):
+        """
+        Removes the search for the key from the ones in flight.
+        """
+        with self._inflight_lock:
+            del self._inflight[key]
+
+    def _search_and_cache(self, key: tuple, query: str,
+                          rate_limit: bool = True) -> Dict[str, Union[List[Document], List[str]]]:
+        """
+        Searches the query and caches the results.
+        """
+        results = self._search(query, rate_limit)
+        self._cache_put(key, results)
+        return results
 
-        for result in results:
+    def run_stream(self, query: str) -> Iterator[Document]:
+        """
+        Uses [Duckduckgo](https://duckduckgo.com/) to search the web, yielding the documents one by one.
+
+        The search runs as soon as the iteration starts and goes through the cache and the sharing of concurrent
+        identical searches, as in `run`. duckduckgo returns all the results at once, so nothing is fetched while
+        iterating: this is an iterator interface over the same documents returned by `run`.
+
+        :param query: Search query.
+        :returns: An iterator over the documents returned by the search engine.
+        """
+        yield from self.run(query)["documents"]
+
+    def _search(self, query: str, rate_limit: bool = True) -> Dict[str, Union[List[Document], List[str]]]:
+        """
+        Queries duckduckgo and converts the results to documents and links.
+        """
+        answers, results = self._fetch(query, rate_limit)
+
+        documents = []
+        for answer in answers:
             documents.append(
-                Document.from_dict({"title": result["title"], "content": result["body"], "link": result["href"]})
+                Document(content=answer["text"], meta={"title": '', "link": answer["url"]})
             )
 
-        # answer box has a direct answer to the query
-
-        links = [result["href"] for result in results]
+        # results is a list of dictionaries each with title, body, href,
+        # converting them to Documents and links in a single pass:
+        links = []
+        # Both lists are cut to top_k: the remaining results would be discarded
+        for result in islice(results, self.top_k):
+            if self.top_k is None or len(documents) < self.top_k:
+                documents.append(
+                    Document(content=result["body"], meta={"title": result["title"], "link": result["href"]})
+                )
+            links.append(result["href"])
 
         logger.debug(
             "SearchApi returned {number_documents} documents for the query '{query}'",
             number_documents=len(documents),
             query=query,
         )
-        return {"documents": documents[:self.top_k], "links": links[:self.top_k]}
+        return {"documents": documents, "links": links}
+
+    def _fetch(self, query: str, rate_limit: bool = True) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """
+        Queries duckduckgo, returning the raw answers (if use_answers is set) and text results.
 
+        Searches that are rate limited, time out or fail because another search broke the shared client are retried
+        up to max_retries times, waiting 0.1, 0.2, 0.4... seconds (at most 2) in between.
+        """
+        if rate_limit and self._rate_limited:
+            self._rate_limit() # Wait for the next search
+
+        payload = dict(self.search_params, keywords=self._query_prefix + query)
+
+        for attempt in range(self.max_retries + 1):
+            ddgs = self.ddgs
+            try:
+                if self.use_answers:
+                    # The answers and the text searches are independent: run them concurrently
+                    with ThreadPoolExecutor(max_workers=1) as executor:
+                        answers_future = executor.submit(ddgs.answers, query)
+                        results = ddgs.text(**payload)
+                        answers = answers_future.result()
+                else:
+                    answers = []
+                    results = ddgs.text(**payload)
+                return answers, results
+            except DuckDuckGoSearchException as e:
+                # duckduckgo_search refuses any request after an error: start again with a new client, which also
+                # drops the cached vqd tokens
+                self._replace_client(ddgs)
+                retryable = isinstance(e, (RatelimitException, TimeoutException)) or str(e) == _FAILED_CLIENT_ERROR
+                if not retryable or attempt == self.max_retries:
+                    raise DuckduckgoApiWebSearchError(f"An error occurred while querying {self.__class__.__name__}."
+                                                   f"Error: {e}") from e
+                logger.warning("Duckduckgo search failed with {error}, retrying (attempt {attempt})",
+                               error=e, attempt=attempt + 1)
+                sleep(min(2 ** attempt * 0.1, 2.0))
 
 if __name__ == '__main__':
     searcher = DuckduckgoApiWebSearch()
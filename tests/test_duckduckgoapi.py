@@ -1,8 +1,65 @@
-from time import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep, time
 
+import pytest
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import DuckDuckGoSearchException, RatelimitException, TimeoutException
 from haystack import Document
 
 from duckduckgo_api_haystack import DuckduckgoApiWebSearch
+from duckduckgo_api_haystack.duckduckgoapi import DuckduckgoApiWebSearchError
+
+
+class FakeDDGS:
+    """
+    Stands in for duckduckgo_search.DDGS, counting the calls instead of querying the web.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.text_calls = 0
+        self.answers_calls = 0
+
+    def text(self, keywords, max_results=10, **kwargs):
+        self.text_calls += 1
+        self.max_results = max_results
+        sleep(self.delay)
+        return [{"title": f"Result {i}", "body": f"{keywords} {i}", "href": f"https://example.com/{i}"}
+                for i in range(max_results or 10)]
+
+    def answers(self, keywords):
+        self.answers_calls += 1
+        return [{"text": f"Answer to {keywords}", "url": "https://example.com/answer"}]
+
+
+class FailingDDGS(FakeDDGS):
+    """
+    Behaves like duckduckgo_search.DDGS after an error: every later search on the same client fails.
+
+    The first search of "rate limited" is rate limited, searching "server error" always fails.
+    """
+
+    rate_limited = False
+
+    def __init__(self, delay=0.05):
+        super().__init__(delay)
+        self.failed = Event()
+
+    def text(self, keywords, max_results=10, **kwargs):
+        if keywords == "server error":
+            self.failed.set()
+            raise DuckDuckGoSearchException("500 return None")
+        if keywords == "rate limited" and not FailingDDGS.rate_limited:
+            FailingDDGS.rate_limited = True
+            self.failed.set()
+            raise RatelimitException("202 Ratelimit")
+        results = super().text(keywords, max_results, **kwargs)
+        if self.failed.is_set():
+            raise DuckDuckGoSearchException("Exception occurred in previous call.")
+        return results
+
 
 class TestDuckduckgoApiWebSearch:
 
@@ -13,15 +70,294 @@ class TestDuckduckgoApiWebSearch:
         new_component = DuckduckgoApiWebSearch().from_dict(data)
         assert data == {'init_parameters': {'allowed_domain': 'test.com', 'backend': 'api', 'max_results': 10,
                                             'proxy': 'proxytest.com', 'region': 'wt-wt', 'safesearch': 'moderate',
-                                            'timelimit': None, 'timeout': 20, 'top_k': 12, 'use_answers': True},
+                                            'timelimit': None, 'timeout': 20, 'top_k': 12, 'use_answers': True,
+                                            'searches_per_second': None, 'search_burst': 1, 'max_retries': 2,
+                                            'cache_size': 0, 'cache_ttl': None, 'cache_path': None},
                         'type': 'duckduckgo_api_haystack.duckduckgoapi.DuckduckgoApiWebSearch'}
         assert data == new_component.to_dict()
 
+    def test_cache(self):
+        component = DuckduckgoApiWebSearch(top_k=5, cache_size=1)
+        component.ddgs = FakeDDGS()
+        first = component.run("What is frico?")
+        second = component.run("What is frico?")
+        assert component.ddgs.text_calls == 1
+        assert first == second
+        assert len(second["documents"]) == 5
+
+        # The cache holds a single query: the first one gets evicted
+        component.run("What is polenta?")
+        component.run("What is frico?")
+        assert component.ddgs.text_calls == 3
+
+    def test_cache_normalized_query(self):
+        component = DuckduckgoApiWebSearch(cache_size=10)
+        component.ddgs = FakeDDGS()
+        component.run("What is frico?")
+        component.run("  what IS   frico ")
+        component.run("What is frico ?")
+        assert component.ddgs.text_calls == 1
+        component.run("What is polenta?")
+        assert component.ddgs.text_calls == 2
+
+    def test_cache_ttl(self):
+        component = DuckduckgoApiWebSearch(cache_size=10, cache_ttl=0)
+        component.ddgs = FakeDDGS()
+        component.run("What is frico?")
+        sleep(0.01)
+        component.run("What is frico?")
+        assert component.ddgs.text_calls == 2
+
+    def test_top_k_limits_search(self):
+        component = DuckduckgoApiWebSearch(top_k=3, max_results=50)
+        component.ddgs = FakeDDGS()
+        results = component.run("What is frico?")
+        assert component.ddgs.max_results == 3
+        assert len(results["documents"]) == 3
+        assert len(results["links"]) == 3
+
+    def test_concurrent_identical_queries(self):
+        component = DuckduckgoApiWebSearch()
+        component.ddgs = FakeDDGS(delay=0.2)
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            answers = list(executor.map(component.run, ["What is frico?"] * 5))
+        assert component.ddgs.text_calls == 1
+        assert all(answer == answers[0] for answer in answers)
+
+    def test_leader_checks_cache(self):
+        component = DuckduckgoApiWebSearch(cache_size=10, searches_per_second=1)
+        component.ddgs = FakeDDGS()
+        component.run("What is frico?")
+
+        # The first lookup misses, as if the search that cached the results completed right after it
+        cache_get = component._cache_get
+        lookups = []
+
+        def cache_get_missing_once(key):
+            lookups.append(key)
+            return None if len(lookups) == 1 else cache_get(key)
+
+        component._cache_get = cache_get_missing_once
+        component.run("What is frico?")
+        lookups.clear()
+        start_time = time()
+        asyncio.run(component.run_async("What is frico?"))
+        assert component.ddgs.text_calls == 1
+        assert time() - start_time < 0.5, "Expected no rate limit token to be taken"
+
+    def test_run_many(self):
+        component = DuckduckgoApiWebSearch(top_k=2)
+        component.ddgs = FakeDDGS(delay=0.2)
+        queries = [f"query {i}" for i in range(4)]
+
+        start_time = time()
+        answers = component.run_many(queries, concurrency=4)
+        elapsed_time = time() - start_time
+
+        assert elapsed_time < 0.6, f"Expected the searches to run concurrently, but {elapsed_time:.2f} elapsed"
+        assert [answer["documents"][0].content for answer in answers] == [f"{query} 0" for query in queries]
+
+    def test_run_batch(self):
+        component = DuckduckgoApiWebSearch(top_k=2)
+        component.ddgs = FakeDDGS(delay=0.2)
+        queries = [f"query {i}" for i in range(4)]
+
+        start_time = time()
+        answers = asyncio.run(component.run_batch(queries, concurrency=4))
+        elapsed_time = time() - start_time
+
+        assert elapsed_time < 0.6, f"Expected the searches to run concurrently, but {elapsed_time:.2f} elapsed"
+        assert [answer["documents"][0].content for answer in answers] == [f"{query} 0" for query in queries]
+
+    def test_run_stream(self):
+        component = DuckduckgoApiWebSearch(top_k=4, use_answers=True)
+        component.ddgs = FakeDDGS()
+        stream = component.run_stream("What is frico?")
+        assert next(stream).content == "Answer to What is frico?"
+        assert [document.content for document in stream] == [f"What is frico? {i}" for i in range(3)]
+        assert list(component.run_stream("What is frico?")) == component.run("What is frico?")["documents"]
+
+    def test_run_stream_cache(self):
+        component = DuckduckgoApiWebSearch(cache_size=10)
+        component.ddgs = FakeDDGS()
+        list(component.run_stream("What is frico?"))
+        component.run("What is frico?")
+        assert component.ddgs.text_calls == 1
+
+    def test_run_batch_identical_queries(self):
+        component = DuckduckgoApiWebSearch(searches_per_second=1)
+        component.ddgs = FakeDDGS(delay=0.2)
+
+        # Only the search actually sent takes a token: the other calls wait for its results
+        start_time = time()
+        asyncio.run(component.run_batch(["What is frico?"] * 4, concurrency=4))
+        elapsed_time = time() - start_time
+
+        assert component.ddgs.text_calls == 1
+        assert elapsed_time < 0.9, f"Expected a single rate limit token to be used, but {elapsed_time:.2f} elapsed"
+
+    def test_run_async_cancelled_follower(self):
+        component = DuckduckgoApiWebSearch()
+        component.ddgs = FakeDDGS(delay=0.3)
+
+        async def search():
+            leader = asyncio.create_task(component.run_async("What is frico?"))
+            await asyncio.sleep(0.05)
+            follower = asyncio.create_task(component.run_async("What is frico?"))
+            # A follower giving up must not cancel the search the others are waiting for
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(component.run_async("What is frico?"), 0.05)
+            return await leader, await follower
+
+        leader_answer, follower_answer = asyncio.run(search())
+        assert leader_answer == follower_answer
+        assert component.ddgs.text_calls == 1
+
+    def test_run_async_cancelled_leader(self):
+        component = DuckduckgoApiWebSearch(searches_per_second=1)
+        component.ddgs = FakeDDGS()
+
+        async def search():
+            await component.run_async("What is polenta?")
+            # The leader waits for the rate limit and is cancelled before searching
+            leader = asyncio.create_task(component.run_async("What is frico?"))
+            await asyncio.sleep(0.05)
+            follower = asyncio.create_task(component.run_async("What is frico?"))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(search())["links"]
+
+    def test_answers_first(self):
+        component = DuckduckgoApiWebSearch(top_k=3, use_answers=True)
+        component.ddgs = FakeDDGS()
+        results = component.run("What is frico?")
+        assert component.ddgs.answers_calls == 1
+        assert results["documents"][0].content == "Answer to What is frico?"
+        assert len(results["documents"]) == 3
+        assert results["links"] == [f"https://example.com/{i}" for i in range(3)]
+
+    def test_cache_path(self, tmp_path):
+        cache_path = str(tmp_path / "cache.db")
+        component = DuckduckgoApiWebSearch(top_k=3, use_answers=True, cache_path=cache_path)
+        component.ddgs = FakeDDGS()
+        first = component.run("What is frico?")
+
+        # A new component, as in a new run, finds the results in the database
+        component = DuckduckgoApiWebSearch(top_k=3, use_answers=True, cache_path=cache_path)
+        component.ddgs = FakeDDGS()
+        assert component.run("What is frico?") == first
+        assert component.ddgs.text_calls == 0
+
+        # Results cut to a different top_k are not shared
+        component = DuckduckgoApiWebSearch(top_k=5, use_answers=True, cache_path=cache_path)
+        component.ddgs = FakeDDGS()
+        component.run("What is frico?")
+        assert component.ddgs.text_calls == 1
+
+    def test_close(self, tmp_path):
+        with DuckduckgoApiWebSearch(cache_path=str(tmp_path / "cache.db")) as component:
+            component.ddgs = FakeDDGS()
+            component.run("What is frico?")
+        assert component._cache_db is None
+        # Without the database the component still searches
+        assert component.run("What is frico?")["links"]
+
     def test_search_no_answers(self):
         component = DuckduckgoApiWebSearch(top_k=12, timeout=20, use_answers=False)
         answer = component.run("What is frico?")
         assert isinstance(answer['documents'][0], Document)
 
+    def test_token_bucket(self):
+        searcher = DuckduckgoApiWebSearch(searches_per_second=10, search_burst=2)
+        searcher.ddgs = FakeDDGS()
+
+        start_time = time()
+        # The first 2 searches use the burst, the other 2 wait 0.1 seconds each
+        for _ in range(4):
+            searcher.run("test query")
+        elapsed_time = time() - start_time
+
+        assert 0.2 <= elapsed_time < 1, f"Expected about 0.2 seconds to pass, but {elapsed_time:.2f} elapsed"
+
+    def test_retry_when_rate_limited(self):
+        class RateLimitedDDGS(FakeDDGS):
+            def text(self, keywords, max_results=10, **kwargs):
+                raise RatelimitException("202 Ratelimit")
+
+        component = DuckduckgoApiWebSearch(max_retries=2)
+        component.ddgs = RateLimitedDDGS()
+        component._new_client = FakeDDGS
+        answer = component.run("What is frico?")
+        assert answer["links"]
+
+        component = DuckduckgoApiWebSearch(max_retries=2)
+        component._new_client = RateLimitedDDGS
+        component.ddgs = RateLimitedDDGS()
+        with pytest.raises(DuckduckgoApiWebSearchError):
+            component.run("What is frico?")
+
+    def test_retry_on_timeout(self):
+        class TimingOutDDGS(FakeDDGS):
+            def text(self, keywords, max_results=10, **kwargs):
+                raise TimeoutException("Timeout")
+
+        component = DuckduckgoApiWebSearch(max_retries=1)
+        component.ddgs = TimingOutDDGS()
+        component._new_client = FakeDDGS
+        assert component.run("What is frico?")["links"]
+
+    def test_rate_limited_concurrent_search(self, monkeypatch):
+        monkeypatch.setattr(FailingDDGS, "rate_limited", False)
+        component = DuckduckgoApiWebSearch(top_k=1)
+        component.ddgs = FailingDDGS()
+        component._new_client = FailingDDGS
+        queries = ["rate limited"] + [f"query {i}" for i in range(7)]
+
+        # The other searches fail on the client broken by the rate limit, and are retried on a new one
+        answers = component.run_many(queries, concurrency=8)
+        assert [answer["documents"][0].content for answer in answers] == [f"{query} 0" for query in queries]
+
+    def test_new_client_after_error(self):
+        component = DuckduckgoApiWebSearch()
+        component.ddgs = FailingDDGS()
+        component._new_client = FailingDDGS
+        with pytest.raises(DuckduckgoApiWebSearchError):
+            component.run("server error")
+        assert component.run("What is frico?")["links"]
+
+    def test_vqd_cache(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(DDGS, "_get_vqd", lambda self, keywords: calls.append(keywords) or f"vqd-{keywords}")
+        client = DuckduckgoApiWebSearch()._new_client()
+        assert client._get_vqd("frico") == "vqd-frico"
+        assert client._get_vqd("frico") == "vqd-frico"
+        assert client._get_vqd("polenta") == "vqd-polenta"
+        assert calls == ["frico", "polenta"]
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            DuckduckgoApiWebSearch(searches_per_second=0)
+        with pytest.raises(ValueError):
+            DuckduckgoApiWebSearch(searches_per_second=-1)
+        with pytest.raises(ValueError):
+            DuckduckgoApiWebSearch(searches_per_second=1, search_burst=0)
+        with pytest.raises(ValueError):
+            DuckduckgoApiWebSearch(cache_size=-1)
+        with pytest.raises(ValueError):
+            DuckduckgoApiWebSearch(cache_size=10, cache_ttl=-1)
+
+    def test_empty_query(self):
+        component = DuckduckgoApiWebSearch()
+        component.ddgs = FakeDDGS()
+        for query in ("", "   "):
+            with pytest.raises(DuckduckgoApiWebSearchError):
+                component.run(query)
+            with pytest.raises(DuckduckgoApiWebSearchError):
+                asyncio.run(component.run_async(query))
+        assert component.ddgs.text_calls == 0
+
     def test_rate_limiting(self):
         # Create an instance of DuckduckgoApiWebSearch with a rate limit of 1 search per second & testing it
         searcher = DuckduckgoApiWebSearch(max_search_frequency=1)